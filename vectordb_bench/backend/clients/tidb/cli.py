@@ -73,6 +73,46 @@ class TiDBTypedDict(CommonTypedDict):
             help="Enable or disable SSL, for TiDB Serverless SSL must be enabled",
         ),
     ]
+    insert_workers: Annotated[
+        int,
+        click.option(
+            "--insert-workers",
+            type=int,
+            default=10,
+            show_default=True,
+            help="Number of concurrent connections used to insert one batch",
+        ),
+    ]
+    insert_subbatch_rows: Annotated[
+        int,
+        click.option(
+            "--insert-subbatch-rows",
+            type=int,
+            default=0,
+            show_default=True,
+            help="Rows per concurrent insert statement, 0 keeps the whole batch bounded by 64MB",
+        ),
+    ]
+    driver: Annotated[
+        str,
+        click.option(
+            "--driver",
+            type=click.Choice(["pymysql", "mysqlclient", "asyncmy"]),
+            default="pymysql",
+            show_default=True,
+            help="MySQL client library, mysqlclient and asyncmy must be installed separately",
+        ),
+    ]
+    embedding_precision: Annotated[
+        int,
+        click.option(
+            "--embedding-precision",
+            type=int,
+            default=9,
+            show_default=True,
+            help="Significant digits sent per inserted coordinate, 9 is lossless for float32, 4 is close to fp16",
+        ),
+    ]
 
 
 @cli.command()
@@ -92,6 +132,10 @@ def TiDB(
             port=parameters["port"],
             db_name=parameters["db_name"],
             ssl=parameters["ssl"],
+            insert_workers=parameters["insert_workers"],
+            insert_subbatch_rows=parameters["insert_subbatch_rows"],
+            driver=parameters["driver"],
+            embedding_precision=parameters["embedding_precision"],
         ),
         db_case_config=TiDBIndexConfig(),
         **parameters,
@@ -1,8 +1,16 @@
-from pydantic import BaseModel, SecretStr
+from enum import Enum
+
+from pydantic import BaseModel, SecretStr, conint
 
 from ..api import DBCaseConfig, DBConfig, MetricType
 
 
+class TiDBDriver(str, Enum):
+    PyMySQL = "pymysql"
+    MySQLClient = "mysqlclient"  # libmysqlclient C extension, installed separately
+    AsyncMy = "asyncmy"  # asyncio inserts, other statements fall back to pymysql
+
+
 class TiDBConfig(DBConfig):
     user_name: str = "root"
     password: SecretStr
@@ -10,6 +18,10 @@ class TiDBConfig(DBConfig):
     port: int = 4000
     db_name: str = "test"
     ssl: bool = False
+    insert_workers: conint(ge=1) = 10
+    insert_subbatch_rows: conint(ge=0) = 0  # 0 sizes sub-batches automatically
+    driver: TiDBDriver = TiDBDriver.PyMySQL
+    embedding_precision: conint(ge=1) = 9  # significant digits sent per coordinate, 9 is lossless for float32
 
     def to_dict(self) -> dict:
         pwd_str = self.password.get_secret_value()
@@ -21,6 +33,11 @@ class TiDBConfig(DBConfig):
             "database": self.db_name,
             "ssl_verify_cert": self.ssl,
             "ssl_verify_identity": self.ssl,
+            "local_infile": True,
+            "insert_workers": self.insert_workers,
+            "insert_subbatch_rows": self.insert_subbatch_rows,
+            "driver": self.driver.value,
+            "embedding_precision": self.embedding_precision,
         }
 
 
@@ -1,17 +1,178 @@
+import asyncio
+import atexit
 import concurrent.futures
-import io
+import functools
 import logging
-import time
+import os
+import ssl
+import tempfile
+import threading
 from contextlib import contextmanager
-from typing import Any
+from pathlib import Path
+from typing import IO, Any
 
+import numpy as np
 import pymysql
+from dbutils.pooled_db import PooledDB
+from pymysql.constants import CLIENT
 
 from ..api import VectorDB
-from .config import TiDBIndexConfig
+from .config import TiDBDriver, TiDBIndexConfig
 
 log = logging.getLogger(__name__)
 
+# Seconds between TiFlash status polls in optimize(). Kept short and fixed: optimize time counts
+# towards load duration, and completion is only noticed at the next poll.
+POLL_INTERVAL = 2
+
+# Connections are pooled per process and keyed by connection settings, so helper
+# calls and insert workers reuse established sessions instead of reconnecting.
+_POOLS: dict[tuple, PooledDB] = {}
+# Shared by all insert_embeddings calls in the process, so threads are not respawned per batch.
+_INSERT_EXECUTORS: dict[int, concurrent.futures.ThreadPoolExecutor] = {}
+# With the asyncmy driver, inserts run as coroutines on one background event loop instead.
+_EVENT_LOOP: asyncio.AbstractEventLoop | None = None
+_ASYNC_POOLS: dict[tuple, Any] = {}
+_LOCK = threading.Lock()
+# Pools, executors and the event loop inherited over fork belong to the parent: their sockets are
+# shared with it and their threads do not exist in the child. Children start from empty state and
+# keep the inherited objects referenced, so garbage collection never closes the parent's sockets.
+_FORK_INHERITED: list[tuple] = []
+
+
+def _reset_after_fork():
+    global _POOLS, _INSERT_EXECUTORS, _EVENT_LOOP, _ASYNC_POOLS, _LOCK
+    _FORK_INHERITED.append((_POOLS, _INSERT_EXECUTORS, _EVENT_LOOP, _ASYNC_POOLS))
+    _POOLS = {}
+    _INSERT_EXECUTORS = {}
+    _EVENT_LOOP = None
+    _ASYNC_POOLS = {}
+    _LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    # Only platforms that can fork need the reset
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _mysqlclient_ssl_ca() -> dict:
+    # libmysqlclient requires a CA for VERIFY_IDENTITY and silently ignores a missing one, so resolve the
+    # system CAs like pymysql does. Debian/Ubuntu ship only a capath directory, certifi is the last resort.
+    paths = ssl.get_default_verify_paths()
+    if paths.cafile:
+        return {"ca": paths.cafile}
+    if paths.capath:
+        return {"capath": paths.capath}
+    try:
+        import certifi
+    except ImportError:
+        msg = "No CA certificates found for mysqlclient SSL, set SSL_CERT_FILE or install certifi"
+        raise RuntimeError(msg) from None
+    return {"ca": certifi.where()}
+
+
+def _connect_args(driver: str, db_config: dict) -> tuple[Any, dict]:
+    if driver in (TiDBDriver.PyMySQL, TiDBDriver.AsyncMy):
+        # asyncmy only drives inserts, the synchronous pool always uses pymysql
+        return pymysql, {**db_config, "client_flag": CLIENT.MULTI_STATEMENTS}
+    if driver == TiDBDriver.MySQLClient:
+        import MySQLdb
+
+        # mysqlclient enables multi-statements by default
+        connect_args = dict(db_config)
+        # mysqlclient takes a single ssl_mode instead of pymysql's verification flags
+        ssl_verify_cert = connect_args.pop("ssl_verify_cert")
+        ssl_verify_identity = connect_args.pop("ssl_verify_identity")
+        if ssl_verify_cert or ssl_verify_identity:
+            connect_args["ssl_mode"] = "VERIFY_IDENTITY"
+            connect_args["ssl"] = _mysqlclient_ssl_ca()
+        return MySQLdb, connect_args
+    msg = f"Unsupported TiDB driver: {driver}"
+    raise ValueError(msg)
+
+
+def _get_pool(db_config: dict, workers: int, driver: str) -> PooledDB:
+    key = (*sorted(db_config.items()), workers, driver)
+    with _LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            creator, connect_args = _connect_args(driver, db_config)
+            pool = PooledDB(
+                creator=creator,
+                maxcached=workers,
+                # Insert workers run while init() holds a connection for searching
+                maxconnections=workers * 2,
+                blocking=True,
+                # Transactions are committed or rolled back explicitly, skip the ROLLBACK on return
+                reset=False,
+                # No COM_PING on checkout, which would cost a round trip per insert sub-batch. A dead
+                # connection surfaces on first use instead, SteadyDB reconnects outside transactions.
+                ping=0,
+                # Applied whenever the pool opens a connection, so every session reads from TiFlash
+                setsession=['SET @@TIDB_ISOLATION_READ_ENGINES="tidb,tiflash"'],
+                autocommit=False,
+                **connect_args,
+            )
+            _POOLS[key] = pool
+        return pool
+
+
+def _get_insert_executor(workers: int) -> concurrent.futures.ThreadPoolExecutor:
+    with _LOCK:
+        executor = _INSERT_EXECUTORS.get(workers)
+        if executor is None:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tidb-insert")
+            atexit.register(executor.shutdown, cancel_futures=True)
+            _INSERT_EXECUTORS[workers] = executor
+        return executor
+
+
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    global _EVENT_LOOP
+    with _LOCK:
+        if _EVENT_LOOP is None:
+            _EVENT_LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_EVENT_LOOP.run_forever, name="tidb-asyncio", daemon=True).start()
+        return _EVENT_LOOP
+
+
+def _get_async_pool(db_config: dict, workers: int) -> Any:
+    key = (*sorted(db_config.items()), workers)
+    loop = _get_event_loop()
+    with _LOCK:
+        pool = _ASYNC_POOLS.get(key)
+        if pool is None:
+            import asyncmy
+
+            connect_args = dict(db_config)
+            # asyncmy takes an SSLContext instead of pymysql's verification flags
+            ssl_verify_cert = connect_args.pop("ssl_verify_cert")
+            ssl_verify_identity = connect_args.pop("ssl_verify_identity")
+            if ssl_verify_cert or ssl_verify_identity:
+                connect_args["ssl"] = ssl.create_default_context()
+            pool = asyncio.run_coroutine_threadsafe(
+                asyncmy.create_pool(minsize=0, maxsize=workers, autocommit=False, **connect_args),
+                loop,
+            ).result()
+            _ASYNC_POOLS[key] = pool
+        return pool
+
+
+# Benchmarks reissue the same test queries, so their vector literals are rendered once per process.
+# Keys are normalized to Python floats so ndarray queries render valid literals; for list queries
+# float() returns the same objects, an entry costs about 20 bytes per dimension.
+@functools.lru_cache(maxsize=1024)
+def _vec_to_json(vector: tuple[float, ...]) -> str:
+    return "[" + ",".join(map(repr, vector)) + "]"
+
+
+# TiDB parses VECTOR values from text literals only, it has no binary input such as VEC_FROM_BYTES,
+# so coordinates are sent as compact %g text. One printf-style format per row renders all
+# coordinates in a single C call, it is built once per dimension and shared across insert workers.
+@functools.lru_cache(maxsize=32)
+def _row_format(dim: int, precision: int) -> str:
+    return "%d\t[" + ",".join([f"%.{precision}g"] * dim) + "]\n"
+
 
 class TiDB(VectorDB):
     def __init__(
@@ -24,7 +185,11 @@ class TiDB(VectorDB):
         **kwargs,
     ):
         self.name = "TiDB"
-        self.db_config = db_config
+        self.db_config = dict(db_config)
+        self.insert_workers = self.db_config.pop("insert_workers")
+        self.insert_subbatch_rows = self.db_config.pop("insert_subbatch_rows")
+        self.driver = self.db_config.pop("driver")
+        self.embedding_precision = self.db_config.pop("embedding_precision")
         self.case_config = db_case_config
         self.table_name = collection_name
         self.dim = dim
@@ -32,10 +197,14 @@ class TiDB(VectorDB):
         self.cursor = None  # To be inited by init()
 
         self.search_fn = db_case_config.search_param()["metric_fn"]
+        # Statements are built once, values are always passed as parameters
+        self.load_data_sql = f"LOAD DATA LOCAL INFILE %s INTO TABLE {self.table_name} (id, embedding)"
+        self.search_sql = (
+            f"SELECT id FROM {self.table_name} ORDER BY {self.search_fn}(embedding, %s) LIMIT %s"  # noqa: S608
+        )
 
         if drop_old:
-            self._drop_table()
-            self._create_table()
+            self._recreate_table()
 
     @contextmanager
     def init(self):
@@ -50,169 +219,233 @@ class TiDB(VectorDB):
 
     @contextmanager
     def _get_connection(self):
-        with pymysql.connect(**self.db_config) as conn:
-            conn.autocommit = False
-            with conn.cursor() as cursor:
+        with _get_pool(self.db_config, self.insert_workers, self.driver).connection() as conn, conn.cursor() as cursor:
+            try:
                 yield conn, cursor
+            except Exception:
+                conn.rollback()
+                raise
 
-    def _drop_table(self):
-        try:
-            with self._get_connection() as (conn, cursor):
-                cursor.execute(f"DROP TABLE IF EXISTS {self.table_name}")
-                conn.commit()
-        except Exception as e:
-            log.warning("Failed to drop table: %s error: %s", self.table_name, e)
-            raise
-
-    def _create_table(self):
+    def _recreate_table(self):
         try:
             index_param = self.case_config.index_param()
             with self._get_connection() as (conn, cursor):
+                # Both statements go out in one multi-statement round trip
                 cursor.execute(
                     f"""
+                    DROP TABLE IF EXISTS {self.table_name};
                     CREATE TABLE {self.table_name} (
                         id BIGINT PRIMARY KEY,
                         embedding VECTOR({self.dim}) NOT NULL,
                         VECTOR INDEX (({index_param["metric_fn"]}(embedding)))
-                    );
+                    )
                     """
                 )
+                while cursor.nextset():
+                    pass
                 conn.commit()
         except Exception as e:
-            log.warning("Failed to create table: %s error: %s", self.table_name, e)
+            log.warning("Failed to recreate table: %s error: %s", self.table_name, e)
             raise
 
     def ready_to_load(self) -> bool:
         pass
 
     def optimize(self, data_size: int | None = None) -> None:
-        while True:
-            progress = self._optimize_check_tiflash_replica_progress()
-            if progress != 1:
-                log.info("Data replication not ready, progress: %d", progress)
-                time.sleep(2)
-            else:
-                break
-
-        log.info("Waiting TiFlash to catch up...")
-        self._optimize_wait_tiflash_catch_up()
-
-        log.info("Start compacting TiFlash replica...")
-        self._optimize_compact_tiflash()
-
-        log.info("Waiting index build to finish...")
-        log_reduce_seq = 0
-        while True:
-            pending_rows = self._optimize_get_tiflash_index_pending_rows()
-            if pending_rows > 0:
-                if log_reduce_seq % 15 == 0:
-                    log.info("Index not fully built, pending rows: %d", pending_rows)
-                log_reduce_seq += 1
-                time.sleep(2)
-            else:
-                break
+        with self._get_connection() as (_, cursor):
+            while True:
+                progress, _ = self._optimize_poll_status(cursor, check_index=False, wait=POLL_INTERVAL)
+                if progress != 1:
+                    log.info("Data replication not ready, progress: %s", progress)
+                else:
+                    break
+
+            log.info("Waiting TiFlash to catch up...")
+            self._optimize_wait_tiflash_catch_up(cursor)
+
+            log.info("Start compacting TiFlash replica...")
+            self._optimize_compact_tiflash(cursor)
+
+            log.info("Waiting index build to finish...")
+            log_reduce_seq = 0
+            while True:
+                _, pending_rows = self._optimize_poll_status(cursor, check_index=True, wait=POLL_INTERVAL)
+                if pending_rows > 0:
+                    if log_reduce_seq % 15 == 0:
+                        log.info("Index not fully built, pending rows: %d", pending_rows)
+                    log_reduce_seq += 1
+                else:
+                    break
 
         log.info("Index build finished successfully.")
 
-    def _optimize_check_tiflash_replica_progress(self):
+    def _optimize_poll_status(self, cursor: Any, check_index: bool, wait: float) -> tuple[float, int]:
+        # Reads replica progress and index pending rows, then sleeps on the server before returning
+        # when the awaited condition was not met at read time, so each poll tick is a single round trip.
+        # A build finishing during that sleep is only seen by the next poll.
+        # COMMIT ends the implicit read transaction so the next poll sees fresh state.
         try:
             database = self.db_config["database"]
-            with self._get_connection() as (_, cursor):
-                cursor.execute(
-                    f"""
-                    SELECT PROGRESS FROM information_schema.tiflash_replica
-                    WHERE TABLE_SCHEMA = "{database}" AND TABLE_NAME = "{self.table_name}"
-                    """  # noqa: S608
-                )
-                result = cursor.fetchone()
-                return result[0]
+            cursor.execute(
+                """
+                SELECT s.progress, s.pending_rows,
+                    SLEEP(IF(IFNULL(s.progress, 0) < 1 OR (%s AND IFNULL(s.pending_rows, 0) > 0), %s, 0))
+                FROM (
+                    SELECT
+                        (SELECT PROGRESS FROM information_schema.tiflash_replica
+                         WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s) AS progress,
+                        (SELECT SUM(ROWS_STABLE_NOT_INDEXED) FROM information_schema.tiflash_indexes
+                         WHERE TIDB_DATABASE = %s AND TIDB_TABLE = %s) AS pending_rows
+                ) s;
+                COMMIT
+                """,
+                (check_index, wait, database, self.table_name, database, self.table_name),
+            )
+            progress, pending_rows, _ = cursor.fetchone()
+            while cursor.nextset():
+                pass
         except Exception as e:
-            log.warning("Failed to check TiFlash replica progress: %s", e)
+            log.warning("Failed to poll TiFlash replica status: %s", e)
             raise
+        else:
+            return progress, pending_rows or 0
 
-    def _optimize_wait_tiflash_catch_up(self):
+    def _optimize_wait_tiflash_catch_up(self, cursor: Any):
         try:
-            with self._get_connection() as (conn, cursor):
-                cursor.execute('SET @@TIDB_ISOLATION_READ_ENGINES="tidb,tiflash"')
-                conn.commit()
-                cursor.execute(f"SELECT COUNT(*) FROM {self.table_name}")  # noqa: S608
-                result = cursor.fetchone()
-                return result[0]
+            cursor.execute(f"SELECT COUNT(*) FROM {self.table_name}")  # noqa: S608
+            result = cursor.fetchone()
+            return result[0]
         except Exception as e:
             log.warning("Failed to wait TiFlash to catch up: %s", e)
             raise
 
-    def _optimize_compact_tiflash(self):
+    def _optimize_compact_tiflash(self, cursor: Any):
         try:
-            with self._get_connection() as (conn, cursor):
-                cursor.execute(f"ALTER TABLE {self.table_name} COMPACT")
-                conn.commit()
+            # DDL commits implicitly; index progress is then tracked by the pending rows poll, as the
+            # vector index is built by TiFlash in the background rather than by a DDL job
+            cursor.execute(f"ALTER TABLE {self.table_name} COMPACT TIFLASH REPLICA")
         except Exception as e:
             log.warning("Failed to compact table: %s", e)
             raise
 
-    def _optimize_get_tiflash_index_pending_rows(self):
+    def _insert_embeddings_serial(
+        self,
+        embeddings: np.ndarray,
+        metadata: np.ndarray,
+        offset: int,
+        size: int,
+    ) -> Exception:
         try:
-            database = self.db_config["database"]
-            with self._get_connection() as (_, cursor):
-                cursor.execute(
-                    f"""
-                    SELECT SUM(ROWS_STABLE_NOT_INDEXED)
-                    FROM information_schema.tiflash_indexes
-                    WHERE TIDB_DATABASE = "{database}" AND TIDB_TABLE = "{self.table_name}"
-                    """  # noqa: S608
-                )
-                result = cursor.fetchone()
-                return result[0]
+            # LOAD DATA skips the SQL parser on the server. pymysql streams LOCAL INFILE
+            # from a file path only, so the rows are staged in a temporary TSV file.
+            path = self._stage_rows(embeddings, metadata, offset, size)
+            try:
+                with self._get_connection() as (conn, cursor):
+                    cursor.execute(self.load_data_sql, (path,))
+                    self._check_loaded_rows(cursor.rowcount, size)
+                    conn.commit()
+            finally:
+                Path(path).unlink()
         except Exception as e:
-            log.warning("Failed to read TiFlash index pending rows: %s", e)
+            log.warning("Failed to insert data into table: %s", e)
             raise
 
-    def _insert_embeddings_serial(
+    def _check_loaded_rows(self, loaded: int, size: int):
+        # LOAD DATA LOCAL turns bad rows (duplicate ids, malformed vectors, wrong dimension)
+        # into warnings instead of errors, a short row count is the only signal
+        if loaded != size:
+            msg = f"LOAD DATA inserted {loaded} of {size} rows into {self.table_name}"
+            raise RuntimeError(msg)
+
+    async def _insert_embeddings_async(
         self,
-        embeddings: list[list[float]],
-        metadata: list[int],
+        pool: Any,
+        embeddings: np.ndarray,
+        metadata: np.ndarray,
         offset: int,
         size: int,
-    ) -> Exception:
+    ):
         try:
-            with self._get_connection() as (conn, cursor):
-                buf = io.StringIO()
-                buf.write(f"INSERT INTO {self.table_name} (id, embedding) VALUES ")  # noqa: S608
-                for i in range(offset, offset + size):
-                    if i > offset:
-                        buf.write(",")
-                    buf.write(f'({metadata[i]}, "{embeddings[i]!s}")')
-                cursor.execute(buf.getvalue())
-                conn.commit()
+            # Formatting is CPU work, keep it off the event loop so other batches keep streaming
+            path = await asyncio.to_thread(self._stage_rows, embeddings, metadata, offset, size)
+            try:
+                async with pool.acquire() as conn, conn.cursor() as cursor:
+                    await cursor.execute(self.load_data_sql, (path,))
+                    if cursor.rowcount != size:
+                        await conn.rollback()
+                    self._check_loaded_rows(cursor.rowcount, size)
+                    await conn.commit()
+            finally:
+                Path(path).unlink()
         except Exception as e:
             log.warning("Failed to insert data into table: %s", e)
             raise
 
+    async def _async_insert(
+        self,
+        pool: Any,
+        embeddings: np.ndarray,
+        metadata: np.ndarray,
+        batches: list[tuple[int, int]],
+    ):
+        await asyncio.gather(
+            *(self._insert_embeddings_async(pool, embeddings, metadata, offset, size) for offset, size in batches)
+        )
+
+    def _stage_rows(self, embeddings: np.ndarray, metadata: np.ndarray, offset: int, size: int) -> str:
+        # The file is closed before the driver reopens it by name, which Windows requires, and written
+        # with \n endings to match LOAD DATA's default line terminator. The caller unlinks it.
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".tsv", newline="\n", delete=False) as f:
+            try:
+                self._write_rows(f, embeddings, metadata, offset, size)
+            except Exception:
+                f.close()
+                Path(f.name).unlink()
+                raise
+        return f.name
+
+    def _write_rows(self, f: IO[str], embeddings: np.ndarray, metadata: np.ndarray, offset: int, size: int):
+        row_fmt = _row_format(self.dim, self.embedding_precision)
+        ids = metadata[offset : offset + size].tolist()
+        vectors = embeddings[offset : offset + size].tolist()
+        f.writelines(row_fmt % (m, *vector) for m, vector in zip(ids, vectors, strict=True))
+
     def insert_embeddings(
         self,
-        embeddings: list[list[float]],
-        metadata: list[int],
+        embeddings: list[list[float]] | np.ndarray,
+        metadata: list[int] | np.ndarray,
         **kwargs: Any,
     ) -> tuple[int, Exception]:
-        workers = 10
-        # Avoid exceeding MAX_ALLOWED_PACKET (default=64MB)
+        if len(embeddings) == 0:
+            return 0, None
+        # Sub-batches below are views into these arrays, float32 ndarrays are used without a copy
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        metadata = np.asarray(metadata, dtype=np.int64)
+        # Keep the caller's batch whole unless it exceeds the sub-batch size, which by default
+        # keeps each LOAD DATA transaction well below 64MB
         max_batch_size = 64 * 1024 * 1024 // 24 // self.dim
-        batch_size = len(embeddings) // workers
-        batch_size = min(batch_size, max_batch_size)
-        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-            futures = []
-            for i in range(0, len(embeddings), batch_size):
-                offset = i
-                size = min(batch_size, len(embeddings) - i)
-                future = executor.submit(self._insert_embeddings_serial, embeddings, metadata, offset, size)
-                futures.append(future)
-            done, pending = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_EXCEPTION)
-            executor.shutdown(wait=False)
-            for future in done:
-                future.result()
-            for future in pending:
-                future.cancel()
+        batch_size = min(self.insert_subbatch_rows or max_batch_size, len(embeddings))
+        batches = [(i, min(batch_size, len(embeddings) - i)) for i in range(0, len(embeddings), batch_size)]
+        if self.driver == TiDBDriver.AsyncMy:
+            # The pool is created from this thread, the event loop thread must never block on itself
+            pool = _get_async_pool(self.db_config, self.insert_workers)
+            future = asyncio.run_coroutine_threadsafe(
+                self._async_insert(pool, embeddings, metadata, batches),
+                _get_event_loop(),
+            )
+            future.result()
+            return len(metadata), None
+
+        executor = _get_insert_executor(self.insert_workers)
+        futures = [
+            executor.submit(self._insert_embeddings_serial, embeddings, metadata, offset, size)
+            for offset, size in batches
+        ]
+        done, pending = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_EXCEPTION)
+        for future in pending:
+            future.cancel()
+        for future in done:
+            future.result()
         return len(metadata), None
 
     def search_embedding(
@@ -223,11 +456,6 @@ class TiDB(VectorDB):
         timeout: int | None = None,
         **kwargs: Any,
     ) -> list[int]:
-        self.cursor.execute(
-            f"""
-            SELECT id FROM {self.table_name}
-            ORDER BY {self.search_fn}(embedding, "{query!s}") LIMIT {k};
-            """  # noqa: S608
-        )
-        result = self.cursor.fetchall()
-        return [int(i[0]) for i in result]
+        self.cursor.execute(self.search_sql, (_vec_to_json(tuple(map(float, query))), k))
+        # Both drivers already decode BIGINT ids to int
+        return [row[0] for row in self.cursor.fetchall()]